@@ -5,11 +5,18 @@
 
 Server logic for cloud-based RFID attendance system. Receives UID scans from
 ESP32 via MQTT, validates against MySQL database, logs attendance with Malaysia
-timezone (GMT+8) and sends validation feedback to devices.
+timezone (GMT+8, see malaysia_time.py) and sends validation feedback to devices.
 
 MQTT Topics:
 - Subscribe: "attendance/scan" (receives UID from ESP32)
+- Subscribe: "attendance/scan/batch" (offline-buffered scans from a reader)
+- Subscribe: "attendance/roster" (retained roster change events from dashboard)
 - Publish: "attendance/feedback" (sends validation result)
+- Publish: "attendance/batch/ack/<device>" (exact batch seqs persisted)
+
+Local HTTP:
+- GET http://127.0.0.1:5001/events?since=<seq> (recent scan events ring)
+- POST http://127.0.0.1:5001/events (events from a second logic process)
 
 ================================================================================
 """
@@ -17,8 +24,18 @@ MQTT Topics:
 import paho.mqtt.client as mqtt
 import pymysql
 import json
-import datetime
-import pytz
+import os
+import threading
+import time
+import collections
+import queue
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import malaysia_time
+import profiling
+from log_partitions import hot_window_start, retention_start
 
 # ============================================================================
 # CONFIGURATION
@@ -34,13 +51,34 @@ MQTT_BROKER = "localhost"
 MQTT_PORT = 1883
 MQTT_TOPIC_SCAN = "attendance/scan"
 MQTT_TOPIC_FEEDBACK = "attendance/feedback"
+MQTT_TOPIC_ROSTER = "attendance/roster"
+MQTT_TOPIC_SCAN_BATCH = "attendance/scan/batch"
+MQTT_TOPIC_BATCH_ACK = "attendance/batch/ack"
+MAX_BATCH_SIZE = 500                 # Scans accepted per batch message
+MAX_DEVICE_CLOCK_SKEW = 300          # Seconds a batch ts may run ahead of server time
 
-# Timezone & Status Codes
-MALAYSIA_TIMEZONE = 'Asia/Kuala_Lumpur'
+# Status Codes
 STATUS_PRESENT = 'Present'
 STATUS_DENIED = 'Denied'
 STATUS_SUSPENDED = 'Suspended'
 
+# Scan-Flood Protection
+DEFAULT_DEVICE = "default"           # Shared id (and rate-limit bucket) for readers that send none
+NEGATIVE_CACHE_SIZE = 10000          # Known-unknown UIDs remembered
+NEGATIVE_CACHE_TTL = 300             # Seconds before an unknown UID is re-checked
+RATE_LIMIT_PER_SEC = 2.0             # Sustained new unknown UIDs per device
+RATE_LIMIT_BURST = 10                # Unknown UIDs a device may burst above the rate
+MAX_TRACKED_DEVICES = 1000           # Token buckets kept in memory
+DENIED_FLUSH_INTERVAL = 60           # Seconds between denied-summary flushes
+REASON_CACHED = 'cached'
+REASON_RATE_LIMITED = 'rate_limited'
+
+# Recent Events Ring (served to the dashboard's live feed)
+RING_SIZE = 1024                     # Scan events kept in memory
+RING_HOST = '127.0.0.1'
+RING_PORT = 5001
+RING_FORWARD_TIMEOUT = 2             # Seconds per forwarded batch when another process owns the ring
+
 # ============================================================================
 # DATABASE FUNCTIONS
 # ============================================================================
@@ -68,27 +106,483 @@ def validate_student(cursor, uid):
     cursor.execute(query, (uid,))
     return cursor.fetchone()
 
-def log_attendance(cursor, uid, status, timestamp):
-    """Record attendance event in logs table."""
-    insert_query = "INSERT INTO logs (uid, status, timestamp) VALUES (%s, %s, %s)"
-    cursor.execute(insert_query, (uid, status, timestamp))
+def load_roster(cursor):
+    """Fetch the full roster and its version from one consistent snapshot."""
+    # The connection autocommits, so pin both SELECTs to one transaction
+    cursor.execute("START TRANSACTION WITH CONSISTENT SNAPSHOT")
+    try:
+        cursor.execute("SELECT version FROM roster_meta WHERE id = 1")
+        meta = cursor.fetchone()
+        cursor.execute("SELECT uid, name, status FROM students")
+        students = {row['uid']: row for row in cursor.fetchall()}
+    finally:
+        cursor.execute("COMMIT")
+    if meta is None:
+        raise LookupError("roster_meta has no row with id = 1")
+    return meta['version'], students
+
+def load_recent_logs(cursor, limit):
+    """Most recently recorded scans with student names, oldest first."""
+    query = (
+        "SELECT logs.uid, logs.status, logs.timestamp, logs.ts_ms, students.name "
+        "FROM logs LEFT JOIN students ON logs.uid = students.uid "
+        "WHERE logs.timestamp >= %s ORDER BY logs.id DESC LIMIT %s"
+    )
+    cursor.execute(query, (hot_window_start(), limit))
+    return list(reversed(cursor.fetchall()))
+
+def log_attendance(cursor, uid, status, timestamp, ts_ms):
+    """Record attendance event in logs table (local DATETIME + UTC epoch ms)."""
+    insert_query = "INSERT INTO logs (uid, status, timestamp, ts_ms) VALUES (%s, %s, %s, %s)"
+    cursor.execute(insert_query, (uid, status, timestamp, ts_ms))
     return cursor.lastrowid
 
+def log_attendance_batch(cursor, rows):
+    """Record many (uid, status, timestamp, ts_ms) events with one multi-row insert."""
+    insert_query = "INSERT INTO logs (uid, status, timestamp, ts_ms) VALUES (%s, %s, %s, %s)"
+    cursor.executemany(insert_query, rows)
+
+def fetch_seen_seqs(cursor, device, boot, seqs):
+    """Which of these (device, boot, seq) scans were already persisted."""
+    placeholders = ", ".join(["%s"] * len(seqs))
+    cursor.execute(
+        f"SELECT seq FROM batch_seen WHERE device = %s AND boot = %s AND seq IN ({placeholders}) FOR UPDATE",
+        [device, boot, *seqs]
+    )
+    return {row['seq'] for row in cursor.fetchall()}
+
+def mark_seqs_seen(cursor, device, boot, seqs, received_at):
+    """Record persisted batch scans; the primary key rejects concurrent re-deliveries."""
+    insert_query = "INSERT INTO batch_seen (device, boot, seq, received_at) VALUES (%s, %s, %s, %s)"
+    cursor.executemany(insert_query, [(device, boot, seq, received_at) for seq in seqs])
+
+def fetch_students(cursor, uids):
+    """Fetch many student records with a single IN query."""
+    if not uids:
+        return {}
+    placeholders = ", ".join(["%s"] * len(uids))
+    cursor.execute(f"SELECT uid, name, status FROM students WHERE uid IN ({placeholders})", list(uids))
+    return {row['uid']: row for row in cursor.fetchall()}
+
+def log_denied_summary(cursor, rows):
+    """Record aggregated denied taps as one row per (uid, device, reason)."""
+    insert_query = (
+        "INSERT INTO denied_summary (uid, device, reason, count, first_seen, last_seen) "
+        "VALUES (%s, %s, %s, %s, %s, %s)"
+    )
+    cursor.executemany(insert_query, rows)
+
+# ============================================================================
+# SCAN-FLOOD PROTECTION
+# ============================================================================
+
+class NegativeCache:
+    """Bounded LRU of UIDs known not to be in the students table."""
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = collections.OrderedDict()   # uid -> expiry (monotonic)
+
+    def add(self, uid):
+        self.entries[uid] = time.monotonic() + self.ttl
+        self.entries.move_to_end(uid)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def contains(self, uid):
+        expiry = self.entries.get(uid)
+        if expiry is None:
+            return False
+        if expiry < time.monotonic():
+            del self.entries[uid]
+            return False
+        self.entries.move_to_end(uid)
+        return True
+
+    def discard(self, uid):
+        self.entries.pop(uid, None)
+
+    def clear(self):
+        self.entries.clear()
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, at most `burst` stored."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def consume(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+negative_cache = NegativeCache(NEGATIVE_CACHE_SIZE, NEGATIVE_CACHE_TTL)
+device_buckets = collections.OrderedDict()     # device -> TokenBucket
+denied_counts = {}                             # (uid, device, reason) -> [count, first, last]
+denied_lock = threading.Lock()
+
+def allow_scan(device):
+    """Per-device budget for unknown-UID lookups; False once a reader exceeds it."""
+    bucket = device_buckets.get(device)
+    if bucket is None:
+        bucket = device_buckets[device] = TokenBucket(RATE_LIMIT_PER_SEC, RATE_LIMIT_BURST)
+        if len(device_buckets) > MAX_TRACKED_DEVICES:
+            device_buckets.popitem(last=False)
+    else:
+        device_buckets.move_to_end(device)
+    return bucket.consume()
+
+def record_denied(uid, device, reason, timestamp):
+    """Count a denied tap in memory instead of inserting a row per tap."""
+    key = (uid, device, reason)
+    with denied_lock:
+        entry = denied_counts.get(key)
+        if entry is None:
+            denied_counts[key] = [1, timestamp, timestamp]
+        else:
+            entry[0] += 1
+            entry[2] = timestamp
+
+def flush_denied_summary():
+    """Write accumulated denied taps as summary rows."""
+    global denied_counts
+    with denied_lock:
+        pending, denied_counts = denied_counts, {}
+    if not pending:
+        return
+
+    rows = [
+        (uid, device, reason, count, first_seen, last_seen)
+        for (uid, device, reason), (count, first_seen, last_seen) in pending.items()
+    ]
+    try:
+        conn = get_db_connection()
+        try:
+            with conn.cursor() as cursor:
+                log_denied_summary(cursor, rows)
+        finally:
+            conn.close()
+        print(f"🧾 DENIED SUMMARY: {sum(row[3] for row in rows)} taps in {len(rows)} rows")
+    except pymysql.Error as e:
+        # Put the counts back so the next flush retries them
+        print(f"❌ DENIED SUMMARY ERROR: {e}")
+        with denied_lock:
+            for key, (count, first_seen, last_seen) in pending.items():
+                entry = denied_counts.setdefault(key, [0, first_seen, last_seen])
+                entry[0] += count
+                entry[1] = min(entry[1], first_seen)
+                entry[2] = max(entry[2], last_seen)
+
+# ============================================================================
+# ROSTER CACHE
+# ============================================================================
+
+# In-memory view of the students table, kept current by roster events.
+# roster_version is None until the first load succeeds (scans then fall
+# back to querying the database directly).
+roster = {}
+roster_version = None
+
+def refresh_roster():
+    """Reload the whole roster from the database."""
+    global roster, roster_version
+    try:
+        conn = get_db_connection()
+        try:
+            with conn.cursor() as cursor:
+                version, students = load_roster(cursor)
+        finally:
+            conn.close()
+    except (pymysql.Error, LookupError) as e:
+        # Scans fall back to querying the students table until a reload succeeds
+        print(f"❌ ROSTER LOAD ERROR: {e}")
+        return False
+    roster, roster_version = students, version
+    # Cards added while we were out of sync may still be cached as unknown
+    negative_cache.clear()
+    print(f"📋 ROSTER LOADED: {len(students)} cards (version {version})")
+    return True
+
+def apply_roster_event(event):
+    """Apply one roster change; reload when a version gap shows we missed one."""
+    global roster_version
+    version = event.get("version")
+    if version is None or (roster_version is not None and version <= roster_version):
+        return  # Already applied (e.g. retained copy on reconnect)
+    if roster_version is None or version != roster_version + 1:
+        refresh_roster()
+        return
+
+    uid = event["uid"]
+    if event.get("op") == "remove":
+        roster.pop(uid, None)
+    else:
+        roster[uid] = {"uid": uid, "name": event.get("name"), "status": event.get("status")}
+        negative_cache.discard(uid)
+    roster_version = version
+    print(f"📋 ROSTER v{version}: {event.get('op')} {uid}")
+
+def may_be_registered(uid):
+    """True unless the loaded roster proves the UID is unknown."""
+    return roster_version is None or uid in roster
+
+def lookup_student(cursor, uid):
+    """Resolve a UID from the in-memory roster, or the database if not loaded."""
+    if roster_version is None:
+        return validate_student(cursor, uid)
+    return roster.get(uid)
+
+def lookup_students(cursor, uids):
+    """Resolve a set of UIDs in one pass (memory, or one database query)."""
+    if roster_version is None:
+        return fetch_students(cursor, uids)
+    return {uid: roster[uid] for uid in uids if uid in roster}
+
+def on_roster_message(client, userdata, msg):
+    """Handle roster invalidation events published by the admin API."""
+    try:
+        apply_roster_event(json.loads(msg.payload.decode('utf-8')))
+    except (ValueError, KeyError) as e:
+        print(f"❌ ROSTER EVENT ERROR: {e}")
+
+# ============================================================================
+# RECENT EVENTS RING
+# ============================================================================
+
+class EventRing:
+    """
+    Fixed-size ring of recent scan events: one event per row written to
+    logs (live and offline-batch scans), in the order they were recorded,
+    so it matches the dashboard's SQL fallback. Each slot is one tuple
+    (seq, uid, name, status, ts_ms, device); seq only ever grows, so
+    readers poll with the last seq they saw as a cursor.
+    """
+
+    FIELDS = ("seq", "uid", "name", "status", "ts_ms", "device")
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.slots = [None] * capacity
+        self.next_seq = 1
+        self.instance = f"{os.getpid()}-{int(time.time())}"
+        self.lock = threading.Lock()
+
+    def append(self, uid, name, status, ts_ms, device=None):
+        with self.lock:
+            seq = self.next_seq
+            self.slots[seq % self.capacity] = (seq, uid, name, status, ts_ms, device)
+            self.next_seq = seq + 1
+
+    def since(self, cursor, limit):
+        """Up to `limit` newest events after `cursor`, oldest first."""
+        with self.lock:
+            oldest = max(1, self.next_seq - self.capacity)
+            start = max(cursor + 1, oldest, self.next_seq - limit)
+            events = [self.slots[seq % self.capacity] for seq in range(start, self.next_seq)]
+            return self.next_seq - 1, cursor + 1 < oldest, events
+
+class EventForwarder:
+    """
+    Stand-in for the ring when another logic process already serves it:
+    appends are queued and POSTed to that process, so its feed still shows
+    the scans handled here. Best-effort - the scans are already in logs.
+    """
+
+    FIELDS = ("uid", "name", "status", "ts_ms", "device")
+
+    def __init__(self, url):
+        self.url = url
+        self.queue = queue.Queue(maxsize=RING_SIZE)
+        threading.Thread(target=self._run, name="recent-events-forwarder", daemon=True).start()
+
+    def append(self, uid, name, status, ts_ms, device=None):
+        try:
+            self.queue.put_nowait((uid, name, status, ts_ms, device))
+        except queue.Full:
+            pass  # Ring owner unreachable for a while; drop rather than block scans
+
+    def _run(self):
+        while True:
+            events = [self.queue.get()]
+            while len(events) < RING_SIZE:
+                try:
+                    events.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            body = json.dumps([dict(zip(self.FIELDS, event)) for event in events]).encode('utf-8')
+            request = urllib.request.Request(
+                self.url, data=body, headers={'Content-Type': 'application/json'}, method='POST'
+            )
+            try:
+                urllib.request.urlopen(request, timeout=RING_FORWARD_TIMEOUT).close()
+            except OSError as e:
+                print(f"❌ RECENT EVENTS FORWARD ERROR: {e} - {len(events)} events missing from live feed")
+
+recent_events = EventRing(RING_SIZE)
+
+def warm_recent_events():
+    """Pre-fill the ring from the database so the feed survives restarts."""
+    try:
+        conn = get_db_connection()
+        try:
+            with conn.cursor() as cursor:
+                rows = load_recent_logs(cursor, RING_SIZE)
+        finally:
+            conn.close()
+    except pymysql.Error as e:
+        print(f"❌ RECENT EVENTS LOAD ERROR: {e}")
+        return
+    for row in rows:
+        # Rows written before ts_ms existed only carry the local DATETIME
+        ts_ms = row['ts_ms'] or malaysia_time.local_to_ms(row['timestamp'])
+        recent_events.append(row['uid'], row['name'], row['status'], ts_ms)
+    print(f"🕘 RECENT EVENTS LOADED: {len(rows)}")
+
+class RecentEventsHandler(BaseHTTPRequestHandler):
+    """GET /events?since=<seq>&limit=<n> → JSON slice of the ring."""
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path != '/events':
+            self.send_error(404)
+            return
+        params = parse_qs(url.query)
+        try:
+            since = int(params.get('since', ['0'])[0])
+            limit = min(int(params.get('limit', [str(RING_SIZE)])[0]), RING_SIZE)
+        except ValueError:
+            self.send_error(400)
+            return
+
+        cursor, truncated, events = recent_events.since(since, limit)
+        body = json.dumps({
+            "instance": recent_events.instance,
+            "cursor": cursor,
+            "truncated": truncated,
+            "events": [
+                dict(zip(EventRing.FIELDS, event), timestamp=malaysia_time.format_local(event[4]))
+                for event in events
+            ],
+        }).encode('utf-8')
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        """Append events forwarded by another logic process (see EventForwarder)."""
+        if urlparse(self.path).path != '/events':
+            self.send_error(404)
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            events = json.loads(self.rfile.read(length).decode('utf-8'))
+            for event in events:
+                recent_events.append(
+                    event['uid'], event.get('name'), event['status'], int(event['ts_ms']), event.get('device')
+                )
+        except (ValueError, TypeError, KeyError, AttributeError):
+            self.send_error(400)
+            return
+
+        self.send_response(204)
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass  # Keep the scan log readable
+
+def start_recent_events_server():
+    """
+    Serve the ring on RING_HOST:RING_PORT in the background. If the port is
+    taken (normally by another logic process), forward this process's events
+    there instead and return None.
+    """
+    global recent_events
+    try:
+        server = ThreadingHTTPServer((RING_HOST, RING_PORT), RecentEventsHandler)
+    except OSError as e:
+        # Not fatal: scans still go to logs, and the dashboard falls back to SQL
+        print(f"⚠️  RECENT EVENTS SERVER: {e} - forwarding events to the process on port {RING_PORT}")
+        recent_events = EventForwarder(f"http://{RING_HOST}:{RING_PORT}/events")
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="recent-events", daemon=True).start()
+    print(f"🕘 Recent events served on http://{RING_HOST}:{RING_PORT}/events")
+    return server
+
+def start_denied_flusher():
+    """Flush denied summaries every DENIED_FLUSH_INTERVAL seconds in the background."""
+    def run():
+        while True:
+            time.sleep(DENIED_FLUSH_INTERVAL)
+            flush_denied_summary()
+
+    threading.Thread(target=run, name="denied-flusher", daemon=True).start()
+
 # ============================================================================
 # UTILITY FUNCTIONS
 # ============================================================================
 
-def get_malaysia_timestamp():
-    """Generate current timestamp in Malaysia timezone (GMT+8)."""
-    malaysia_tz = pytz.timezone(MALAYSIA_TIMEZONE)
-    now_malaysia = datetime.datetime.now(malaysia_tz)
-    return now_malaysia.strftime('%Y-%m-%d %H:%M:%S')
+def scan_clock():
+    """Current (local DATETIME, UTC epoch ms) pair for a scan."""
+    ts_ms = malaysia_time.now_ms()
+    return malaysia_time.local_datetime(ts_ms), ts_ms
+
+def device_clock(value):
+    """(local DATETIME, UTC epoch ms) for a device-side epoch timestamp in seconds."""
+    ts_ms = int(float(value) * 1000)
+    return malaysia_time.local_datetime(ts_ms), ts_ms
+
+def scan_status(student):
+    """Log status for a scan given its student record (None = unknown card)."""
+    if not student:
+        return STATUS_DENIED
+    if student.get('status', 'Active') == STATUS_SUSPENDED:
+        return STATUS_SUSPENDED
+    return STATUS_PRESENT
+
+def send_batch_ack(client, device, boot, persisted, rejected, inserted, duplicates, reclocked):
+    """
+    Tell a reader exactly which buffered scans it may discard: seqs now
+    persisted (new or already stored) and seqs rejected as malformed.
+    `reclocked` lists persisted seqs whose ts was out of range and was
+    replaced by the server's receive time.
+    """
+    response = {
+        "boot": boot,
+        "persisted": persisted,
+        "rejected": rejected,
+        "inserted": inserted,
+        "duplicates": duplicates,
+        "reclocked": reclocked,
+    }
+    json_payload = json.dumps(response)
+    client.publish(f"{MQTT_TOPIC_BATCH_ACK}/{device}", json_payload, qos=1)
+    print(f"📤 BATCH ACK SENT to {device}: {json_payload}")
 
-def send_feedback(client, status, name=None):
-    """Publish validation result back to ESP32 via MQTT."""
+def send_feedback(client, status, name=None, scan=None):
+    """
+    Publish validation result back to ESP32 via MQTT.
+    Echoes the scan's uid and optional "req" id so senders can correlate replies.
+    """
     response = {"status": status}
     if name:
         response["name"] = name
+    if isinstance(scan, dict):
+        if scan.get("uid"):
+            response["uid"] = scan["uid"]
+        if scan.get("req") is not None:
+            response["req"] = scan["req"]
     
     json_payload = json.dumps(response)
     client.publish(MQTT_TOPIC_FEEDBACK, json_payload)
@@ -103,6 +597,7 @@ def on_message(client, userdata, msg):
     Handle incoming RFID scan messages from ESP32.
     Process: Decode payload → Validate UID → Log attendance → Send feedback
     """
+    data = {}
     try:
         # Decode and parse JSON payload
         payload_bytes = msg.payload.decode('utf-8')
@@ -111,10 +606,27 @@ def on_message(client, userdata, msg):
         
         data = json.loads(payload_bytes)
         uid = data.get("uid")
+        device = data.get("device") or DEFAULT_DEVICE
         
         if not uid:
             print("❌ ERROR: UID not found in payload")
-            send_feedback(client, "invalid")
+            send_feedback(client, "invalid", scan=data)
+            return
+        
+        # Flood protection: answer repeat unknown UIDs without touching the database
+        # (counted in denied_summary, not logs, so they stay out of the live feed)
+        if negative_cache.contains(uid):
+            print(f"❌ ACCESS DENIED (cached): Unknown UID {uid}")
+            record_denied(uid, device, REASON_CACHED, malaysia_time.now_local())
+            send_feedback(client, "invalid", scan=data)
+            return
+        
+        # Only unknown UIDs are throttled, so a registered student's
+        # attendance is never dropped; id-less readers share one bucket
+        if not may_be_registered(uid) and not allow_scan(device):
+            print(f"🚫 RATE LIMITED: {device} (unknown UID {uid})")
+            record_denied(uid, device, REASON_RATE_LIMITED, malaysia_time.now_local())
+            send_feedback(client, "invalid", scan=data)
             return
         
         print(f"[🔍 SCANNING] UID: {uid}")
@@ -124,8 +636,8 @@ def on_message(client, userdata, msg):
         
         try:
             with conn.cursor() as cursor:
-                timestamp = get_malaysia_timestamp()
-                student = validate_student(cursor, uid)
+                timestamp, ts_ms = scan_clock()
+                student = lookup_student(cursor, uid)
                 
                 # CASE 1: Valid student found
                 if student:
@@ -135,20 +647,24 @@ def on_message(client, userdata, msg):
                     # Check if account is suspended
                     if account_status == STATUS_SUSPENDED:
                         print(f"⚠️  SUSPENDED: {name} at {timestamp}")
-                        log_attendance(cursor, uid, STATUS_SUSPENDED, timestamp)
-                        send_feedback(client, "suspended", name)
+                        log_attendance(cursor, uid, STATUS_SUSPENDED, timestamp, ts_ms)
+                        recent_events.append(uid, name, STATUS_SUSPENDED, ts_ms, device)
+                        send_feedback(client, "suspended", name, scan=data)
                     
                     # Account is active - grant access
                     else:
                         print(f"✅ ACCESS GRANTED: {name} at {timestamp}")
-                        log_attendance(cursor, uid, STATUS_PRESENT, timestamp)
-                        send_feedback(client, "valid", name)
+                        log_attendance(cursor, uid, STATUS_PRESENT, timestamp, ts_ms)
+                        recent_events.append(uid, name, STATUS_PRESENT, ts_ms, device)
+                        send_feedback(client, "valid", name, scan=data)
                 
                 # CASE 2: Unknown UID
                 else:
                     print(f"❌ ACCESS DENIED: Unknown UID at {timestamp}")
-                    log_attendance(cursor, uid, STATUS_DENIED, timestamp)
-                    send_feedback(client, "invalid")
+                    log_attendance(cursor, uid, STATUS_DENIED, timestamp, ts_ms)
+                    recent_events.append(uid, None, STATUS_DENIED, ts_ms, device)
+                    negative_cache.add(uid)
+                    send_feedback(client, "invalid", scan=data)
         
         finally:
             conn.close()
@@ -156,24 +672,135 @@ def on_message(client, userdata, msg):
     
     except json.JSONDecodeError as e:
         print(f"❌ JSON PARSE ERROR: {e}")
-        send_feedback(client, "invalid")
+        send_feedback(client, "invalid", scan=data)
     
     except pymysql.Error as e:
         print(f"❌ DATABASE ERROR: {e}")
-        send_feedback(client, "invalid")
+        send_feedback(client, "invalid", scan=data)
     
     except Exception as e:
         print(f"❌ UNEXPECTED ERROR: {e}")
         import traceback
         traceback.print_exc()
-        send_feedback(client, "invalid")
+        send_feedback(client, "invalid", scan=data)
+
+def process_batch(cursor, device, boot, scans):
+    """
+    Persist one batch of buffered scans inside the caller's transaction.
+    Scans are deduped on (device, boot, seq), so a reader whose counter
+    restarts after a reboot (new boot id) or that resends out of order never
+    has new taps mistaken for duplicates.
+    A device ts older than retention_start() or more than
+    MAX_DEVICE_CLOCK_SKEW ahead (e.g. a reader that never synced its clock)
+    is replaced by the receive time, so the tap still counts and never lands
+    in a partition about to be archived or in pmax.
+    Returns ((persisted_seqs, rejected_seqs, inserted, duplicates, reclocked_seqs),
+    events) where events are the (uid, name, status, ts_ms) rows written to logs.
+    """
+    received, received_ms = scan_clock()
+    earliest_ms = malaysia_time.local_to_ms(retention_start())
+    latest_ms = received_ms + MAX_DEVICE_CLOCK_SKEW * 1000
+
+    candidates = {}
+    rejected = set()
+    out_of_range = set()
+    for scan in scans:
+        try:
+            seq = int(scan["seq"])
+        except (KeyError, TypeError, ValueError):
+            continue  # No usable seq - nothing the reader could be told to discard
+        try:
+            uid = scan["uid"]
+            timestamp, ts_ms = device_clock(scan["ts"])
+        except (KeyError, TypeError, ValueError, OverflowError):
+            rejected.add(seq)
+            continue
+        if not uid:
+            rejected.add(seq)
+            continue
+        if seq in candidates:
+            continue
+        if not earliest_ms <= ts_ms <= latest_ms:
+            out_of_range.add(seq)
+            timestamp, ts_ms = received, received_ms
+        candidates[seq] = (uid, timestamp, ts_ms)
+
+    if not candidates:
+        return ([], sorted(rejected), 0, 0, []), []
+
+    seen = fetch_seen_seqs(cursor, device, boot, list(candidates))
+    fresh = {seq: scan for seq, scan in candidates.items() if seq not in seen}
+
+    events = []
+    if fresh:
+        students = lookup_students(cursor, {uid for uid, _, _ in fresh.values()})
+        rows = []
+        for _, (uid, timestamp, ts_ms) in sorted(fresh.items()):
+            student = students.get(uid)
+            status = scan_status(student)
+            rows.append((uid, status, timestamp, ts_ms))
+            events.append((uid, student['name'] if student else None, status, ts_ms))
+        log_attendance_batch(cursor, rows)
+        mark_seqs_seen(cursor, device, boot, sorted(fresh), received)
+
+    reclocked = sorted(out_of_range.intersection(fresh))
+    if reclocked:
+        print(f"⏰ BATCH RECLOCKED: {len(reclocked)} scans from {device} had an out-of-range ts")
+    ack = (sorted(candidates), sorted(rejected), len(fresh), len(candidates) - len(fresh), reclocked)
+    return ack, events
+
+def on_batch_message(client, userdata, msg):
+    """
+    Handle a backlog of scans buffered by a reader while offline.
+    Payload: {"device": "...", "boot": "<id of this power-on>",
+              "scans": [{"uid": "...", "ts": <epoch>, "seq": <int>}, ...]}
+    """
+    try:
+        data = json.loads(msg.payload.decode('utf-8'))
+        device = data.get("device")
+        boot = data.get("boot")
+        scans = data.get("scans")
+        if not device or boot in (None, "") or not isinstance(scans, list) or len(scans) > MAX_BATCH_SIZE:
+            print(f"❌ BATCH REJECTED: malformed or oversized batch from {device}")
+            return
+        boot = str(boot)
+
+        print(f"[📦 BATCH] {len(scans)} scans from {device}")
+        conn = get_db_connection()
+        try:
+            conn.begin()
+            with conn.cursor() as cursor:
+                ack, events = process_batch(cursor, device, boot, scans)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+        # Ack and publish to the live feed only after commit, so a failed
+        # batch is resent by the reader and never shown twice
+        for uid, name, status, ts_ms in events:
+            recent_events.append(uid, name, status, ts_ms, device)
+        send_batch_ack(client, device, boot, *ack)
+
+    except (ValueError, AttributeError) as e:
+        print(f"❌ BATCH PARSE ERROR: {e}")
+
+    except pymysql.Error as e:
+        print(f"❌ BATCH DATABASE ERROR: {e}")
+
+    except Exception as e:
+        print(f"❌ UNEXPECTED BATCH ERROR: {e}")
+        import traceback
+        traceback.print_exc()
 
 def on_connect(client, userdata, flags, rc):
     """Callback when MQTT client connects to broker."""
     if rc == 0:
         print("✅ Connected to MQTT broker")
-        print(f"📡 Subscribing to: {MQTT_TOPIC_SCAN}")
-        client.subscribe(MQTT_TOPIC_SCAN)
+        print(f"📡 Subscribing to: {MQTT_TOPIC_SCAN}, {MQTT_TOPIC_SCAN_BATCH}, {MQTT_TOPIC_ROSTER}")
+        client.subscribe([(MQTT_TOPIC_SCAN, 0), (MQTT_TOPIC_SCAN_BATCH, 1), (MQTT_TOPIC_ROSTER, 1)])
     else:
         print(f"❌ Connection failed with code {rc}")
 
@@ -195,13 +822,29 @@ def main():
     print("="*70)
     print(f"Database: {DB_HOST}")
     print(f"MQTT Broker: {MQTT_BROKER}:{MQTT_PORT}")
-    print(f"Timezone: {MALAYSIA_TIMEZONE} (GMT+8)")
+    print(f"Timezone: {malaysia_time.MALAYSIA_TIMEZONE} (GMT+8)")
+    print(f"Profiling: kill -USR1 {os.getpid()}")
     print("="*70)
     
+    # Opt-in profiling window on SIGUSR1 (idle until triggered)
+    profiling.install_signal_handler("logic", focus=("on_message", "on_batch_message"))
+    
+    # Periodic summary rows for denied taps answered from memory
+    start_denied_flusher()
+    
+    # Roster is served from memory and kept current by push events
+    refresh_roster()
+    
+    # Live feed for the dashboard without a database round trip
+    warm_recent_events()
+    start_recent_events_server()
+    
     # Create and configure MQTT client
     client = mqtt.Client(client_id="AttendanceServer", clean_session=True)
     client.on_connect = on_connect
     client.on_message = on_message
+    client.message_callback_add(MQTT_TOPIC_ROSTER, on_roster_message)
+    client.message_callback_add(MQTT_TOPIC_SCAN_BATCH, on_batch_message)
     client.on_disconnect = on_disconnect
     
     try:
@@ -214,6 +857,7 @@ def main():
     except KeyboardInterrupt:
         print("\n🛑 Server shutdown requested")
         client.disconnect()
+        flush_denied_summary()
         print("👋 Goodbye!")
     
     except Exception as e:
@@ -234,10 +878,36 @@ Database Schema Required:
    - name VARCHAR(100) NOT NULL
    - status VARCHAR(20) DEFAULT 'Active'
 
-2. logs table:
-   - id INT PRIMARY KEY AUTO_INCREMENT
+2. logs table (monthly RANGE partitions on timestamp, see log_partitions.py):
+   - id INT AUTO_INCREMENT
    - uid VARCHAR(50)
    - status VARCHAR(20)
-   - timestamp DATETIME
+   - timestamp DATETIME NOT NULL (Malaysia local time)
+   - ts_ms BIGINT (UTC epoch milliseconds)
+   - PRIMARY KEY (id, timestamp)
+
+3. roster_meta table (single row, bumped on every roster change):
+   - id INT PRIMARY KEY (always 1)
+   - version BIGINT NOT NULL
+
+4. batch_seen table (offline-batch scans already persisted, pruned by log_partitions.py):
+   - device VARCHAR(50)
+   - boot VARCHAR(50)
+   - seq BIGINT
+   - received_at DATETIME
+   - PRIMARY KEY (device, boot, seq)
+
+5. denied_summary table (aggregated repeat/rate-limited denials):
+   - id INT PRIMARY KEY AUTO_INCREMENT
+   - uid VARCHAR(50)
+   - device VARCHAR(50)
+   - reason VARCHAR(20)
+   - count INT
+   - first_seen DATETIME
+   - last_seen DATETIME
+
+6. scanned_cards / rolled_up_partitions tables (all-time card totals, see log_partitions.py):
+   - scanned_cards.uid VARCHAR(50) PRIMARY KEY
+   - rolled_up_partitions.name VARCHAR(16) PRIMARY KEY
 ================================================================================
 """
\ No newline at end of file
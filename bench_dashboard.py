@@ -0,0 +1,325 @@
+"""
+================================================================================
+            CLOUD RFID ATTENDANCE SYSTEM - DASHBOARD LOAD BENCHMARK
+================================================================================
+
+Benchmarks dashboard.py against a LOCAL stand-in MySQL database.
+
+1. seed - creates the schema in BENCH_DB_NAME and fills it with realistic
+          volumes (default 10k students, 5M logs over 180 days with the
+          08:00 rush, repeat taps and ~5% unknown cards).
+2. run  - serves dashboard.py in-process against the bench database (or hits
+          --url) and drives its routes at increasing concurrency, reporting
+          requests/sec, p50/p95/p99 latency and DB queries per request.
+          In-process runs read the live feed from SQL (--feed sql) or from a
+          bench-local event ring warmed from the bench database (--feed ring).
+
+Usage:
+- docker run -d -p 3306:3306 -e MYSQL_ROOT_PASSWORD=bench mysql:8
+- python3 bench_dashboard.py seed
+- python3 bench_dashboard.py run --levels 1,4,16,64 --duration 20 --out results.csv
+- python3 bench_dashboard.py run --feed ring --out results-ring.csv
+
+================================================================================
+"""
+
+import argparse
+import csv
+import datetime
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import pymysql
+import pymysql.cursors
+
+import malaysia_time
+from replay_scans import percentile
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+# Local stand-in database - never point this at production
+BENCH_DB_HOST = '127.0.0.1'
+BENCH_DB_USER = 'root'
+BENCH_DB_PASS = 'bench'
+BENCH_DB_NAME = 'attendance_bench'
+
+BENCH_HOST = '127.0.0.1'
+BENCH_PORT = 5055
+BENCH_RING_PORT = 5056     # Bench-local event ring for --feed ring
+
+DEFAULT_STUDENTS = 10000
+DEFAULT_LOGS = 5000000
+DEFAULT_DAYS = 180
+SEED_CHUNK = 10000
+UNKNOWN_RATIO = 0.05       # Share of taps from unregistered cards
+SUSPENDED_RATIO = 0.01     # Share of students that are suspended
+RUSH_RATIO = 0.6           # Share of taps in the 08:00 rush
+
+DEFAULT_LEVELS = "1,2,4,8,16,32,64"
+DEFAULT_DURATION = 15      # Seconds per concurrency level
+REQUEST_TIMEOUT = 30
+ERROR_MARKER = b"System Error"    # dashboard.py error page (older builds return it with 200)
+
+# ============================================================================
+# DATABASE FUNCTIONS
+# ============================================================================
+
+def get_bench_connection(database=BENCH_DB_NAME):
+    """Connect to the local stand-in database."""
+    return pymysql.connect(
+        host=BENCH_DB_HOST,
+        user=BENCH_DB_USER,
+        password=BENCH_DB_PASS,
+        database=database,
+        cursorclass=pymysql.cursors.DictCursor,
+        connect_timeout=10
+    )
+
+def count_questions(cursor):
+    """Server-wide statement counter, used to derive queries per request."""
+    cursor.execute("SHOW GLOBAL STATUS LIKE 'Questions'")
+    return int(cursor.fetchone()['Value'])
+
+# ============================================================================
+# SEEDING
+# ============================================================================
+
+def random_uid(rng):
+    """UID formatted like the firmware sends it, e.g. 'C1 2A 4B 99'."""
+    return " ".join(f"{rng.randrange(256):02X}" for _ in range(4))
+
+def random_tap_time(rng, day):
+    """Tap time on `day`: mostly the 08:00 rush, the rest spread over the day."""
+    if rng.random() < RUSH_RATIO:
+        seconds = int(rng.gauss(8 * 3600, 600))
+    else:
+        seconds = rng.randrange(7 * 3600, 18 * 3600)
+    return datetime.datetime.combine(day, datetime.time.min) + datetime.timedelta(seconds=seconds)
+
+def seed(students, logs, days, partition):
+    """Recreate the bench schema and fill it with synthetic data."""
+    rng = random.Random(357)
+    conn = get_bench_connection(database=None)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(f"DROP DATABASE IF EXISTS {BENCH_DB_NAME}")
+            cursor.execute(f"CREATE DATABASE {BENCH_DB_NAME}")
+            cursor.execute(f"USE {BENCH_DB_NAME}")
+            cursor.execute(
+                "CREATE TABLE students (uid VARCHAR(50) PRIMARY KEY, name VARCHAR(100), "
+                "status VARCHAR(20) DEFAULT 'Active')"
+            )
+            # Production gets idx_logs_timestamp from migrate (run below with --partition)
+            cursor.execute(
+                "CREATE TABLE logs (id INT AUTO_INCREMENT PRIMARY KEY, uid VARCHAR(50), "
+                "status VARCHAR(20), timestamp DATETIME, ts_ms BIGINT"
+                + ("" if partition else ", INDEX idx_logs_timestamp (timestamp)") + ")"
+            )
+            cursor.execute("CREATE TABLE roster_meta (id INT PRIMARY KEY, version BIGINT NOT NULL)")
+            cursor.execute("CREATE TABLE scanned_cards (uid VARCHAR(50) PRIMARY KEY)")
+            cursor.execute("CREATE TABLE rolled_up_partitions (name VARCHAR(16) PRIMARY KEY)")
+            cursor.execute("INSERT INTO roster_meta (id, version) VALUES (1, 0)")
+
+            print(f"🌱 Seeding {students} students...")
+            roster = {}
+            while len(roster) < students:
+                status = 'Suspended' if rng.random() < SUSPENDED_RATIO else 'Active'
+                roster[random_uid(rng)] = (f"Student {len(roster) + 1}", status)
+            cursor.executemany(
+                "INSERT INTO students (uid, name, status) VALUES (%s, %s, %s)",
+                [(uid, name, status) for uid, (name, status) in roster.items()]
+            )
+            conn.commit()
+
+            print(f"🌱 Seeding {logs} logs over {days} days...")
+            uids = list(roster)
+            today = malaysia_time.today_local()
+            inserted = 0
+            while inserted < logs:
+                rows = []
+                for _ in range(min(SEED_CHUNK, logs - inserted)):
+                    day = today - datetime.timedelta(days=rng.randrange(days))
+                    if rng.random() < UNKNOWN_RATIO:
+                        uid, status = random_uid(rng), 'Denied'
+                    else:
+                        uid = rng.choice(uids)
+                        status = 'Suspended' if roster[uid][1] == 'Suspended' else 'Present'
+                    timestamp = random_tap_time(rng, day)
+                    rows.append((uid, status, timestamp, malaysia_time.local_to_ms(timestamp)))
+                cursor.executemany("INSERT INTO logs (uid, status, timestamp, ts_ms) VALUES (%s, %s, %s, %s)", rows)
+                conn.commit()
+                inserted += len(rows)
+                print(f"   {inserted}/{logs}", end="\r")
+            print()
+
+            # Stand-in for the all-time roll-up that log_partitions.py maintains
+            cursor.execute("INSERT IGNORE INTO scanned_cards (uid) SELECT DISTINCT uid FROM logs")
+            conn.commit()
+    finally:
+        conn.close()
+
+    if partition:
+        import log_partitions
+        log_partitions.DB_HOST, log_partitions.DB_USER = BENCH_DB_HOST, BENCH_DB_USER
+        log_partitions.DB_PASS, log_partitions.DB_NAME = BENCH_DB_PASS, BENCH_DB_NAME
+        conn = log_partitions.get_db_connection()
+        try:
+            with conn.cursor() as cursor:
+                log_partitions.migrate(cursor)
+        finally:
+            conn.close()
+
+    print("✅ Seed complete")
+
+# ============================================================================
+# LOAD GENERATION
+# ============================================================================
+
+def start_local_ring():
+    """Serve a logic-server event ring warmed from the bench database; returns its URL."""
+    import attendance_logic
+
+    attendance_logic.DB_HOST, attendance_logic.DB_USER = BENCH_DB_HOST, BENCH_DB_USER
+    attendance_logic.DB_PASS, attendance_logic.DB_NAME = BENCH_DB_PASS, BENCH_DB_NAME
+    attendance_logic.RING_HOST, attendance_logic.RING_PORT = BENCH_HOST, BENCH_RING_PORT
+
+    attendance_logic.warm_recent_events()
+    if attendance_logic.start_recent_events_server() is None:
+        raise SystemExit(f"❌ Bench ring port {BENCH_RING_PORT} is busy")
+    return f"http://{BENCH_HOST}:{BENCH_RING_PORT}/events"
+
+def start_local_dashboard(feed):
+    """Serve dashboard.py in a background thread against the bench database."""
+    from werkzeug.serving import make_server
+    import dashboard
+
+    dashboard.DB_HOST, dashboard.DB_USER = BENCH_DB_HOST, BENCH_DB_USER
+    dashboard.DB_PASS, dashboard.DB_NAME = BENCH_DB_PASS, BENCH_DB_NAME
+    # Never depend on whatever happens to listen on the production ring port
+    dashboard.RECENT_EVENTS_URL = start_local_ring() if feed == 'ring' else None
+
+    server = make_server(BENCH_HOST, BENCH_PORT, dashboard.app, threaded=True)
+    threading.Thread(target=server.serve_forever, name="bench-dashboard", daemon=True).start()
+    return server, f"http://{BENCH_HOST}:{BENCH_PORT}"
+
+def run_level(url, concurrency, duration):
+    """Hammer `url` from `concurrency` closed-loop clients for `duration` seconds."""
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def worker():
+        local, failed = [], 0
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                with urllib.request.urlopen(url, timeout=REQUEST_TIMEOUT) as response:
+                    body = response.read()
+            except (urllib.error.URLError, OSError):
+                # HTTPError (4xx/5xx) is a URLError subclass
+                failed += 1
+                continue
+            if ERROR_MARKER in body:
+                failed += 1
+            else:
+                local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+            errors[0] += failed
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors[0],
+        "rps": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+    }
+
+def run(base_url, routes, levels, duration, out_path, feed):
+    """Benchmark each route at each concurrency level and print a table."""
+    server = None
+    if base_url is None:
+        server, base_url = start_local_dashboard(feed)
+        print(f"ℹ️  Live feed source: {feed}")
+
+    stats_conn = get_bench_connection()
+    results = []
+    try:
+        print(f"{'route':<12}{'conc':>6}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'q/req':>8}{'errors':>8}")
+        for route in routes:
+            for concurrency in levels:
+                with stats_conn.cursor() as cursor:
+                    before = count_questions(cursor)
+                result = run_level(base_url + route, concurrency, duration)
+                with stats_conn.cursor() as cursor:
+                    # The two SHOW STATUS calls themselves count as statements
+                    queries = count_questions(cursor) - before - 1
+                result["route"] = route
+                result["feed"] = feed if server is not None else "external"
+                result["queries_per_request"] = queries / max(result["requests"], 1)
+                results.append(result)
+                print(f"{route:<12}{concurrency:>6}{result['rps']:>10.1f}{result['p50_ms']:>10.1f}"
+                      f"{result['p95_ms']:>10.1f}{result['p99_ms']:>10.1f}"
+                      f"{result['queries_per_request']:>8.2f}{result['errors']:>8}")
+    finally:
+        stats_conn.close()
+        if server is not None:
+            server.shutdown()
+
+    if out_path:
+        with open(out_path, 'w', newline='') as out:
+            writer = csv.DictWriter(out, fieldnames=list(results[0]))
+            writer.writeheader()
+            writer.writerows(results)
+        print(f"📝 Results written to {out_path}")
+
+# ============================================================================
+# MAIN PROGRAM
+# ============================================================================
+
+def main():
+    """Seed the stand-in database or run the load benchmark."""
+    parser = argparse.ArgumentParser(description="Load benchmark for dashboard.py.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    seed_parser = commands.add_parser('seed', help="Recreate and fill the bench database")
+    seed_parser.add_argument('--students', type=int, default=DEFAULT_STUDENTS)
+    seed_parser.add_argument('--logs', type=int, default=DEFAULT_LOGS)
+    seed_parser.add_argument('--days', type=int, default=DEFAULT_DAYS)
+    seed_parser.add_argument('--partition', action='store_true', help="Partition logs like production")
+
+    run_parser = commands.add_parser('run', help="Drive dashboard routes at increasing concurrency")
+    run_parser.add_argument('--url', help="Benchmark an already running dashboard instead")
+    run_parser.add_argument('--routes', default="/", help="Comma-separated routes")
+    run_parser.add_argument('--levels', default=DEFAULT_LEVELS, help="Comma-separated concurrency levels")
+    run_parser.add_argument('--duration', type=float, default=DEFAULT_DURATION)
+    run_parser.add_argument('--out', help="Write results to CSV for later comparison")
+    run_parser.add_argument('--feed', choices=['sql', 'ring'], default='sql',
+                            help="Live feed source for the in-process dashboard (ignored with --url)")
+
+    args = parser.parse_args()
+    if args.command == 'seed':
+        seed(args.students, args.logs, args.days, args.partition)
+    else:
+        levels = [int(level) for level in args.levels.split(',')]
+        routes = [route.strip() for route in args.routes.split(',')]
+        run(args.url.rstrip('/') if args.url else None, routes, levels, args.duration, args.out, args.feed)
+
+if __name__ == "__main__":
+    main()
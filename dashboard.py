@@ -10,10 +10,17 @@ attractive modern UI.
 ================================================================================
 """
 
-from flask import Flask, render_template_string
+from flask import Flask, render_template_string, request, jsonify, abort
+import paho.mqtt.client as mqtt
 import pymysql
-from datetime import datetime
-import pytz
+import collections
+import json
+import threading
+import urllib.request
+
+import malaysia_time
+import profiling
+from log_partitions import hot_window_start, unrolled_start
 
 app = Flask(__name__)
 
@@ -25,6 +32,21 @@ DB_USER = 'liyana'
 DB_PASS = '123456'
 DB_NAME = 'attendance_db'
 
+# Roster invalidation events (retained, consumed by every logic server)
+MQTT_BROKER = "localhost"
+MQTT_PORT = 1883
+MQTT_TOPIC_ROSTER = "attendance/roster"
+ROSTER_PUBLISH_ATTEMPTS = 3
+ROSTER_PUBLISH_TIMEOUT = 2           # Seconds to wait for the broker's PUBACK
+
+# Live feed served from the logic server's in-memory ring
+RECENT_EVENTS_URL = "http://127.0.0.1:5001/events"   # None: always read the feed from SQL
+RECENT_EVENTS_TIMEOUT = 0.5
+FEED_SIZE = 10
+
+STATUS_ACTIVE = 'Active'
+STATUS_SUSPENDED = 'Suspended'
+
 def get_db_connection():
     """Establish MySQL database connection."""
     return pymysql.connect(
@@ -554,6 +576,57 @@ HTML_TEMPLATE = """
 </html>
 """
 
+# ============================================================================
+# LIVE FEED
+# ============================================================================
+
+_feed = collections.deque(maxlen=FEED_SIZE)
+_feed_cursor = 0
+_feed_instance = None
+_feed_lock = threading.Lock()
+
+def _poll_recent_events(since):
+    """One request to the logic server's ring; None if it is unreachable."""
+    url = f"{RECENT_EVENTS_URL}?since={since}&limit={FEED_SIZE}"
+    try:
+        with urllib.request.urlopen(url, timeout=RECENT_EVENTS_TIMEOUT) as response:
+            return json.load(response)
+    except (OSError, ValueError):
+        return None
+
+def fetch_live_feed():
+    """
+    Newest-first recent events from the logic server, polling only for
+    events after the last cursor seen. Returns None if the logic server is
+    unreachable (or RECENT_EVENTS_URL is None) so the caller can fall back
+    to the database.
+    """
+    global _feed_cursor, _feed_instance
+    if RECENT_EVENTS_URL is None:
+        return None
+    # Poll without the lock so a slow logic server never stalls other requests
+    with _feed_lock:
+        since, instance = _feed_cursor, _feed_instance
+    data = _poll_recent_events(since)
+    if data is None:
+        return None
+
+    # A restarted logic server starts a new sequence - resync from scratch
+    if data["instance"] != instance and since:
+        data = _poll_recent_events(0)
+        if data is None:
+            return None
+
+    with _feed_lock:
+        if data["instance"] != _feed_instance:
+            _feed.clear()
+            _feed_cursor = 0
+            _feed_instance = data["instance"]
+        # Concurrent polls may overlap - only merge events not seen yet
+        _feed.extend(event for event in data["events"] if event["seq"] > _feed_cursor)
+        _feed_cursor = max(_feed_cursor, data["cursor"])
+        return list(reversed(_feed))
+
 # ============================================================================
 # ROUTES
 # ============================================================================
@@ -564,28 +637,42 @@ def index():
     try:
         conn = get_db_connection()
         with conn.cursor() as cursor:
-            # Fetch recent logs with student names
-            sql_logs = """
-            SELECT logs.id, logs.uid, logs.status, logs.timestamp, students.name 
-            FROM logs 
-            LEFT JOIN students ON logs.uid = students.uid 
-            ORDER BY logs.timestamp DESC 
-            LIMIT 10
-            """
-            cursor.execute(sql_logs)
-            logs = cursor.fetchall()
-
-            # Calculate statistics with Malaysia timezone
-            malaysia_tz = pytz.timezone('Asia/Kuala_Lumpur')
-            today_date = datetime.now(malaysia_tz).strftime('%Y-%m-%d')
-
-            # Present today (unique valid students)
-            sql_today = "SELECT COUNT(DISTINCT uid) as count FROM logs WHERE status='Present' AND DATE(timestamp) = %s"
-            cursor.execute(sql_today, (today_date,))
+            # Recent activity from the logic server's ring (no database round trip)
+            logs = fetch_live_feed()
+            
+            # Fallback: most recently recorded logs with student names (hot
+            # partitions only), in the same insertion order as the ring
+            if logs is None:
+                sql_logs = """
+                SELECT logs.id, logs.uid, logs.status, logs.timestamp, students.name 
+                FROM logs 
+                LEFT JOIN students ON logs.uid = students.uid 
+                WHERE logs.timestamp >= %s 
+                ORDER BY logs.id DESC 
+                LIMIT %s
+                """
+                cursor.execute(sql_logs, (hot_window_start(), FEED_SIZE))
+                logs = cursor.fetchall()
+
+            # Calculate statistics with Malaysia timezone (precomputed day bounds)
+            today_start, tomorrow_start = malaysia_time.today_range()
+
+            # Present today (unique valid students) - index range scan, prunes partitions
+            sql_today = "SELECT COUNT(DISTINCT uid) as count FROM logs WHERE status='Present' AND timestamp >= %s AND timestamp < %s"
+            cursor.execute(sql_today, (today_start, tomorrow_start))
             present_today = cursor.fetchone()['count']
 
-            # Total unique cards scanned (all time)
-            cursor.execute("SELECT COUNT(DISTINCT uid) as count FROM logs")
+            # Total unique cards scanned (all time): rolled-up history + every
+            # partition not rolled up yet, so it holds even if the cron is behind
+            since = unrolled_start(cursor)
+            sql_total = f"""
+            SELECT COUNT(*) as count FROM (
+                SELECT uid FROM scanned_cards
+                UNION
+                SELECT uid FROM logs {"WHERE timestamp >= %s" if since else ""}
+            ) AS cards
+            """
+            cursor.execute(sql_total, (since,) if since else None)
             total_unique_scanned = cursor.fetchone()['count']
 
             stats = {
@@ -607,7 +694,151 @@ def index():
                 <p style='color:#6b7280;'>{e}</p>
             </div>
         </div>
-        """
+        """, 500
+
+# ============================================================================
+# ADMIN HELPERS
+# ============================================================================
+
+_mqtt_client = None
+_mqtt_lock = threading.Lock()
+
+def require_local_admin():
+    """Admin endpoints are only reachable from the VM itself."""
+    if request.remote_addr not in ('127.0.0.1', '::1'):
+        abort(403)
+
+def get_mqtt_client():
+    """Lazily connect a background MQTT client for publishing roster events."""
+    global _mqtt_client
+    with _mqtt_lock:
+        if _mqtt_client is None:
+            client = mqtt.Client(client_id="AttendanceDashboard", clean_session=True)
+            client.connect(MQTT_BROKER, MQTT_PORT, keepalive=60)
+            client.loop_start()
+            _mqtt_client = client
+        return _mqtt_client
+
+def bump_roster_version(cursor):
+    """Atomically increment the roster version inside the current transaction."""
+    cursor.execute("UPDATE roster_meta SET version = LAST_INSERT_ID(version + 1) WHERE id = 1")
+    cursor.execute("SELECT LAST_INSERT_ID() AS version")
+    return cursor.fetchone()['version']
+
+def publish_roster_event(event):
+    """Publish a retained invalidation event; True only once the broker has acknowledged it."""
+    payload = json.dumps(event)
+    for attempt in range(1, ROSTER_PUBLISH_ATTEMPTS + 1):
+        try:
+            info = get_mqtt_client().publish(MQTT_TOPIC_ROSTER, payload, qos=1, retain=True)
+            if info.rc == mqtt.MQTT_ERR_SUCCESS:
+                info.wait_for_publish(ROSTER_PUBLISH_TIMEOUT)
+                if info.is_published():
+                    return True
+        except (OSError, RuntimeError, ValueError) as e:
+            print(f"❌ ROSTER PUBLISH ERROR (attempt {attempt}): {e}")
+    return False
+
+def change_roster(op, uid, sql, params, name=None, status=None):
+    """Apply one roster change, bump the version and broadcast it."""
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cursor:
+            if cursor.execute(sql, params) == 0:
+                conn.rollback()
+                return jsonify({"error": f"no change for uid {uid}"}), 404
+            if name is None and op != 'remove':
+                cursor.execute("SELECT name FROM students WHERE uid = %s", (uid,))
+                name = cursor.fetchone()['name']
+            version = bump_roster_version(cursor)
+        conn.commit()
+    except pymysql.IntegrityError:
+        conn.rollback()
+        return jsonify({"error": f"uid {uid} already exists"}), 409
+    finally:
+        conn.close()
+
+    event = {"version": version, "op": op, "uid": uid, "name": name, "status": status}
+    event["published"] = publish_roster_event(event)
+    if not event["published"]:
+        # Saved, but logic servers keep the old view until the next change reveals the gap
+        event["error"] = "roster change saved but not delivered to logic servers; restart them or make another roster change once the broker is back"
+        return jsonify(event), 503
+    return jsonify(event), 200
+
+# ============================================================================
+# ADMIN ROUTES
+# ============================================================================
+
+@app.route('/admin/roster', methods=['GET'])
+def roster_list():
+    """List all cards with the current roster version."""
+    require_local_admin()
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT uid, name, status FROM students ORDER BY name")
+            students = cursor.fetchall()
+            cursor.execute("SELECT version FROM roster_meta WHERE id = 1")
+            version = cursor.fetchone()['version']
+    finally:
+        conn.close()
+    return jsonify({"version": version, "students": students})
+
+@app.route('/admin/roster', methods=['POST'])
+def roster_add():
+    """Register a new card: {"uid": "...", "name": "..."}."""
+    require_local_admin()
+    data = request.get_json(silent=True) or {}
+    uid, name = data.get('uid'), data.get('name')
+    if not uid or not name:
+        return jsonify({"error": "uid and name are required"}), 400
+    return change_roster(
+        'add', uid,
+        "INSERT INTO students (uid, name, status) VALUES (%s, %s, %s)", (uid, name, STATUS_ACTIVE),
+        name=name, status=STATUS_ACTIVE
+    )
+
+@app.route('/admin/roster/<uid>/suspend', methods=['POST'])
+def roster_suspend(uid):
+    """Suspend a card; scans are logged as Suspended and refused."""
+    require_local_admin()
+    return change_roster(
+        'suspend', uid,
+        "UPDATE students SET status = %s WHERE uid = %s AND status <> %s",
+        (STATUS_SUSPENDED, uid, STATUS_SUSPENDED), status=STATUS_SUSPENDED
+    )
+
+@app.route('/admin/roster/<uid>/reactivate', methods=['POST'])
+def roster_reactivate(uid):
+    """Reactivate a suspended card."""
+    require_local_admin()
+    return change_roster(
+        'reactivate', uid,
+        "UPDATE students SET status = %s WHERE uid = %s AND status <> %s",
+        (STATUS_ACTIVE, uid, STATUS_ACTIVE), status=STATUS_ACTIVE
+    )
+
+@app.route('/admin/roster/<uid>', methods=['DELETE'])
+def roster_remove(uid):
+    """Remove a card from the roster; it becomes unknown immediately."""
+    require_local_admin()
+    return change_roster('remove', uid, "DELETE FROM students WHERE uid = %s", (uid,))
+
+@app.route('/admin/profile', methods=['POST'])
+def admin_profile():
+    """Start a profiling window for this process (localhost only)."""
+    require_local_admin()
+    try:
+        seconds = int(request.args.get('seconds', profiling.PROFILE_WINDOW))
+    except ValueError:
+        seconds = None  # e.g. ?seconds=abc - reject instead of silently using the default
+    if seconds is None or not profiling.MIN_PROFILE_WINDOW <= seconds <= profiling.MAX_PROFILE_WINDOW:
+        return jsonify({"error": f"seconds must be between {profiling.MIN_PROFILE_WINDOW} "
+                                 f"and {profiling.MAX_PROFILE_WINDOW}"}), 400
+    started = profiling.start_profile("dashboard", seconds=seconds, focus=("index",))
+    return jsonify({"started": started, "seconds": seconds, "output": profiling.PROFILE_DIR}), (202 if started else 409)
 
 if __name__ == '__main__':
+    profiling.install_signal_handler("dashboard", focus=("index",))
     app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
@@ -0,0 +1,334 @@
+"""
+================================================================================
+            CLOUD RFID ATTENDANCE SYSTEM - LOG PARTITION MANAGER
+================================================================================
+
+Maintenance script for the `logs` table. Splits logs into monthly range
+partitions on `timestamp`, creates upcoming partitions ahead of time, and
+archives expired partitions to compressed CSV files before dropping them.
+
+Queries that filter on `timestamp` with a plain range (see hot_window_start())
+only touch the partitions they need, so the dashboard stays fast no matter how
+much history is kept. Cards seen in cold partitions are rolled up into
+`scanned_cards` (before any partition is dropped), so all-time totals survive
+archival and only read the partitions not rolled up yet (see unrolled_start()).
+
+Usage:
+- python3 log_partitions.py migrate    (one-off: partition an existing table)
+- python3 log_partitions.py maintain   (daily cron: create ahead + archive)
+- python3 log_partitions.py status     (list partitions and row counts)
+
+================================================================================
+"""
+
+import argparse
+import csv
+import datetime
+import gzip
+import os
+
+import pymysql
+import pymysql.cursors
+
+import malaysia_time
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+DB_HOST = '34.29.88.122'
+DB_USER = 'liyana'
+DB_PASS = '123456'
+DB_NAME = 'attendance_db'
+
+# Partition Policy
+LOGS_TABLE = 'logs'
+PARTITIONS_AHEAD = 3      # Future monthly partitions kept ready for inserts
+RETENTION_MONTHS = 12     # Full months kept online before archival
+HOT_MONTHS = 2            # Months (incl. current) read by the live dashboard
+ARCHIVE_DIR = 'archive'   # Destination for exported partitions
+BATCH_SEEN_RETENTION_DAYS = 30  # Offline-batch dedupe keys kept (readers resend sooner)
+SCANNED_CARDS_TABLE = 'scanned_cards'            # All-time distinct UIDs
+ROLLUP_TABLE = 'rolled_up_partitions'            # Partitions already rolled up
+CATCHALL_PARTITION = 'pmax'
+
+# ============================================================================
+# DATABASE FUNCTIONS
+# ============================================================================
+
+def get_db_connection():
+    """Establish MySQL database connection with autocommit enabled."""
+    return pymysql.connect(
+        host=DB_HOST,
+        user=DB_USER,
+        password=DB_PASS,
+        database=DB_NAME,
+        autocommit=True,
+        cursorclass=pymysql.cursors.DictCursor,
+        connect_timeout=10
+    )
+
+def list_partitions(cursor):
+    """Return [(name, rows)] for the range partitions of the logs table."""
+    cursor.execute(
+        "SELECT PARTITION_NAME AS name, TABLE_ROWS AS row_count "
+        "FROM information_schema.PARTITIONS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL "
+        "ORDER BY PARTITION_ORDINAL_POSITION",
+        (LOGS_TABLE,)
+    )
+    return [(row['name'], row['row_count']) for row in cursor.fetchall()]
+
+# ============================================================================
+# UTILITY FUNCTIONS
+# ============================================================================
+
+def month_start(date, offset=0):
+    """Return the first day of the month `offset` months away from `date`."""
+    index = date.year * 12 + (date.month - 1) + offset
+    return datetime.date(index // 12, index % 12 + 1, 1)
+
+def partition_name(month):
+    """Partition holding rows of the given month, e.g. p202601."""
+    return f"p{month.year:04d}{month.month:02d}"
+
+def partition_month(name):
+    """Inverse of partition_name(); returns None for the catch-all partition."""
+    if name == CATCHALL_PARTITION:
+        return None
+    return datetime.date(int(name[1:5]), int(name[5:7]), 1)
+
+def partition_clause(month):
+    """DDL fragment for a single monthly partition."""
+    upper = month_start(month, 1).isoformat()
+    return f"PARTITION {partition_name(month)} VALUES LESS THAN ('{upper}')"
+
+def hot_window_start(today=None):
+    """
+    Lower timestamp bound for live dashboard queries.
+    Filtering with `timestamp >= hot_window_start()` lets MySQL prune every
+    partition older than the last HOT_MONTHS months.
+    """
+    today = today or malaysia_time.today_local()
+    return datetime.datetime.combine(month_start(today, -(HOT_MONTHS - 1)), datetime.time.min)
+
+def retention_start(today=None):
+    """Oldest timestamp kept online; older rows are archived and dropped."""
+    today = today or malaysia_time.today_local()
+    return datetime.datetime.combine(month_start(today, -RETENTION_MONTHS), datetime.time.min)
+
+# ============================================================================
+# PARTITION MANAGEMENT
+# ============================================================================
+
+def ensure_ts_ms_column(cursor):
+    """Add the UTC epoch-millisecond column written by the scan path."""
+    cursor.execute(
+        "SELECT COUNT(*) AS found FROM information_schema.COLUMNS "
+        "WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s AND COLUMN_NAME = 'ts_ms'",
+        (DB_NAME, LOGS_TABLE)
+    )
+    if not cursor.fetchone()['found']:
+        cursor.execute(f"ALTER TABLE {LOGS_TABLE} ADD COLUMN ts_ms BIGINT NULL")
+        print("➕ Added logs.ts_ms column")
+
+def migrate(cursor):
+    """
+    Convert an unpartitioned logs table into monthly partitions.
+    MySQL requires the partition column in every unique key, so the primary
+    key becomes (id, timestamp).
+    """
+    ensure_ts_ms_column(cursor)
+    if list_partitions(cursor):
+        print("ℹ️  logs table is already partitioned")
+        return
+
+    cursor.execute(f"SELECT MIN(timestamp) AS oldest FROM {LOGS_TABLE}")
+    oldest = cursor.fetchone()['oldest']
+    today = malaysia_time.today_local()
+    first = month_start(oldest.date() if oldest else today)
+    last = month_start(today, PARTITIONS_AHEAD)
+
+    months = []
+    month = first
+    while month <= last:
+        months.append(month)
+        month = month_start(month, 1)
+
+    print(f"🔧 Rebuilding {LOGS_TABLE} with {len(months)} monthly partitions...")
+    cursor.execute(
+        f"ALTER TABLE {LOGS_TABLE} "
+        "MODIFY timestamp DATETIME NOT NULL, "
+        "DROP PRIMARY KEY, ADD PRIMARY KEY (id, timestamp), "
+        "ADD INDEX idx_logs_timestamp (timestamp)"
+    )
+    clauses = [partition_clause(m) for m in months]
+    clauses.append(f"PARTITION {CATCHALL_PARTITION} VALUES LESS THAN (MAXVALUE)")
+    cursor.execute(
+        f"ALTER TABLE {LOGS_TABLE} PARTITION BY RANGE COLUMNS(timestamp) ({', '.join(clauses)})"
+    )
+    roll_up_cold_partitions(cursor)
+    print("✅ Migration complete")
+
+def create_upcoming_partitions(cursor, today=None):
+    """Split the catch-all partition so the next PARTITIONS_AHEAD months exist."""
+    today = today or malaysia_time.today_local()
+    existing = {partition_month(name) for name, _ in list_partitions(cursor)}
+    existing.discard(None)
+    if not existing:
+        print("⚠️  logs table is not partitioned - run 'migrate' first")
+        return []
+
+    newest = max(existing)
+    target = month_start(today, PARTITIONS_AHEAD)
+    missing = []
+    month = month_start(newest, 1)
+    while month <= target:
+        missing.append(month)
+        month = month_start(month, 1)
+
+    if missing:
+        clauses = [partition_clause(m) for m in missing]
+        clauses.append(f"PARTITION {CATCHALL_PARTITION} VALUES LESS THAN (MAXVALUE)")
+        cursor.execute(
+            f"ALTER TABLE {LOGS_TABLE} REORGANIZE PARTITION {CATCHALL_PARTITION} "
+            f"INTO ({', '.join(clauses)})"
+        )
+        print(f"➕ Created partitions: {', '.join(partition_name(m) for m in missing)}")
+    return missing
+
+def export_partition(connection, name):
+    """Stream one partition to ARCHIVE_DIR/logs_<name>.csv.gz; return the path."""
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    path = os.path.join(ARCHIVE_DIR, f"{LOGS_TABLE}_{name}.csv.gz")
+    tmp_path = path + ".part"
+
+    count = 0
+    # Unbuffered cursor keeps memory flat for large partitions
+    with connection.cursor(pymysql.cursors.SSCursor) as cursor, \
+            gzip.open(tmp_path, 'wt', newline='') as archive:
+        cursor.execute(f"SELECT id, uid, status, timestamp, ts_ms FROM {LOGS_TABLE} PARTITION ({name})")
+        writer = csv.writer(archive)
+        writer.writerow(['id', 'uid', 'status', 'timestamp', 'ts_ms'])
+        for row in cursor:
+            writer.writerow(row)
+            count += 1
+
+    # Only publish the archive once it is completely written
+    os.replace(tmp_path, path)
+    print(f"📦 Archived {count} rows from {name} → {path}")
+    return path
+
+def archive_expired_partitions(connection, today=None):
+    """Export and drop partitions older than RETENTION_MONTHS full months."""
+    cutoff = retention_start(today).date()
+
+    with connection.cursor() as cursor:
+        expired = [
+            name for name, _ in list_partitions(cursor)
+            if partition_month(name) is not None and partition_month(name) < cutoff
+        ]
+
+    for name in expired:
+        export_partition(connection, name)
+        with connection.cursor() as cursor:
+            # Re-run the roll-up so late inserts (e.g. offline batches) still count
+            roll_up_partition(cursor, name)
+            cursor.execute(f"ALTER TABLE {LOGS_TABLE} DROP PARTITION {name}")
+        print(f"🗑️  Dropped partition {name}")
+    return expired
+
+def prune_batch_seen(cursor):
+    """Forget offline-batch dedupe keys older than BATCH_SEEN_RETENTION_DAYS."""
+    cutoff = malaysia_time.now_local() - datetime.timedelta(days=BATCH_SEEN_RETENTION_DAYS)
+    pruned = cursor.execute("DELETE FROM batch_seen WHERE received_at < %s", (cutoff,))
+    if pruned:
+        print(f"🧹 Pruned {pruned} batch dedupe keys")
+
+def maintain(connection):
+    """Daily job: keep future partitions ready and enforce retention."""
+    with connection.cursor() as cursor:
+        create_upcoming_partitions(cursor)
+        roll_up_cold_partitions(cursor)
+        prune_batch_seen(cursor)
+    archive_expired_partitions(connection)
+
+def roll_up_partition(cursor, name):
+    """Add every UID seen in one partition to the all-time scanned_cards table."""
+    cursor.execute(
+        f"INSERT IGNORE INTO {SCANNED_CARDS_TABLE} (uid) "
+        f"SELECT DISTINCT uid FROM {LOGS_TABLE} PARTITION ({name}) WHERE uid IS NOT NULL"
+    )
+    cursor.execute(f"INSERT IGNORE INTO {ROLLUP_TABLE} (name) VALUES (%s)", (name,))
+
+def roll_up_cold_partitions(cursor, today=None):
+    """Roll up each partition once it has left the hot window."""
+    hot_start = partition_name(hot_window_start(today).date())
+    cursor.execute(f"SELECT name FROM {ROLLUP_TABLE}")
+    done = {row['name'] for row in cursor.fetchall()}
+
+    rolled = []
+    for name, _ in list_partitions(cursor):
+        if name == CATCHALL_PARTITION or name >= hot_start or name in done:
+            continue
+        roll_up_partition(cursor, name)
+        rolled.append(name)
+    if rolled:
+        print(f"🧮 Rolled up scanned cards from: {', '.join(rolled)}")
+    return rolled
+
+def unrolled_start(cursor):
+    """
+    Lower timestamp bound of the logs not yet rolled up into scanned_cards:
+    the start of the oldest partition missing from rolled_up_partitions.
+    Returns None when nothing is rolled up (e.g. the table was never
+    migrated), meaning every log row still counts.
+    """
+    cursor.execute(f"SELECT name FROM {ROLLUP_TABLE}")
+    done = {row['name'] for row in cursor.fetchall()}
+
+    previous = None
+    for name, _ in list_partitions(cursor):
+        month = partition_month(name)
+        if month is None and previous is not None:
+            month = month_start(previous, 1)  # Catch-all starts where the last range ends
+        if name not in done:
+            return datetime.datetime.combine(month, datetime.time.min) if month else None
+        previous = month
+    return None
+
+def print_status(cursor):
+    """Print partitions with approximate row counts."""
+    partitions = list_partitions(cursor)
+    if not partitions:
+        print("ℹ️  logs table is not partitioned")
+        return
+    hot_start = partition_name(hot_window_start().date())
+    for name, rows in partitions:
+        tag = "🔥" if name == CATCHALL_PARTITION or name >= hot_start else "🧊"
+        print(f"{tag} {name:<10} ~{rows} rows")
+
+# ============================================================================
+# MAIN PROGRAM
+# ============================================================================
+
+def main():
+    """Run the requested partition maintenance command."""
+    parser = argparse.ArgumentParser(description="Manage monthly partitions of the logs table.")
+    parser.add_argument('command', choices=['migrate', 'maintain', 'status'])
+    args = parser.parse_args()
+
+    conn = get_db_connection()
+    try:
+        if args.command == 'migrate':
+            with conn.cursor() as cursor:
+                migrate(cursor)
+        elif args.command == 'maintain':
+            maintain(conn)
+        else:
+            with conn.cursor() as cursor:
+                print_status(cursor)
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    main()
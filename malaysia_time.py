@@ -0,0 +1,103 @@
+"""
+================================================================================
+            CLOUD RFID ATTENDANCE SYSTEM - SHARED TIME HANDLING
+================================================================================
+
+Single source of time for the logic server, dashboard and maintenance
+scripts. The Malaysia zone is resolved once at import; the scan path reads a
+monotonic clock anchored to wall time instead of building tz-aware datetimes.
+
+Two representations are stored per log row:
+- ts_ms       BIGINT   UTC epoch milliseconds (precise, zone-free)
+- timestamp   DATETIME Malaysia local time to the second (display, partitions)
+
+Day boundaries are produced as [start, end) local DATETIME ranges so "today"
+queries are index range scans instead of DATE(timestamp) per row.
+
+================================================================================
+"""
+
+import datetime
+import time
+
+import pytz
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+MALAYSIA_TIMEZONE = 'Asia/Kuala_Lumpur'
+CLOCK_RESYNC_INTERVAL = 60      # Seconds before re-anchoring to wall time
+
+MALAYSIA_TZ = pytz.timezone(MALAYSIA_TIMEZONE)
+
+# Malaysia has kept a fixed UTC+8 offset (no DST) since 1982, so one lookup is enough
+UTC_OFFSET = MALAYSIA_TZ.utcoffset(datetime.datetime(2000, 1, 1))
+UTC_OFFSET_MS = int(UTC_OFFSET.total_seconds() * 1000)
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+_ONE_DAY = datetime.timedelta(days=1)
+
+_anchor = (time.time(), time.monotonic())
+_today_cache = (None, None)
+
+# ============================================================================
+# CLOCK
+# ============================================================================
+
+def _resync():
+    """Re-anchor the monotonic clock to the wall clock (picks up NTP corrections)."""
+    global _anchor
+    _anchor = (time.time(), time.monotonic())
+
+def now_ms():
+    """Current UTC epoch milliseconds from the anchored monotonic clock."""
+    wall, mono = _anchor
+    elapsed = time.monotonic() - mono
+    if elapsed > CLOCK_RESYNC_INTERVAL:
+        _resync()
+        wall, mono = _anchor
+        elapsed = time.monotonic() - mono
+    return int((wall + elapsed) * 1000)
+
+# ============================================================================
+# CONVERSIONS
+# ============================================================================
+
+def local_datetime(ms):
+    """Naive Malaysia-local DATETIME (whole seconds) for UTC epoch milliseconds."""
+    return _EPOCH + datetime.timedelta(seconds=(ms + UTC_OFFSET_MS) // 1000)
+
+def local_to_ms(local):
+    """UTC epoch milliseconds for a naive Malaysia-local datetime."""
+    return (local - _EPOCH) // datetime.timedelta(milliseconds=1) - UTC_OFFSET_MS
+
+def format_local(ms):
+    """'YYYY-MM-DD HH:MM:SS' in Malaysia time."""
+    return local_datetime(ms).isoformat(' ')
+
+def now_local():
+    """Current Malaysia-local DATETIME."""
+    return local_datetime(now_ms())
+
+def today_local():
+    """Current calendar date in Malaysia."""
+    return now_local().date()
+
+# ============================================================================
+# DAY BOUNDARIES
+# ============================================================================
+
+def day_range(day):
+    """[start, end) local DATETIME bounds of a calendar day."""
+    start = datetime.datetime.combine(day, datetime.time.min)
+    return start, start + _ONE_DAY
+
+def today_range():
+    """Bounds of today in Malaysia, recomputed only when the date rolls over."""
+    global _today_cache
+    today = today_local()
+    day, bounds = _today_cache
+    if day != today:
+        bounds = day_range(today)
+        _today_cache = (today, bounds)
+    return bounds
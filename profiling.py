@@ -0,0 +1,216 @@
+"""
+================================================================================
+            CLOUD RFID ATTENDANCE SYSTEM - ON-DEMAND PROFILER
+================================================================================
+
+Opt-in profiling for the running logic server and dashboard. A profiling
+window samples the Python stack of every thread that is busy inside a focus
+function (e.g. on_message, index) at a fixed interval and records a
+tracemalloc snapshot, then writes the results to PROFILE_DIR. Idle threads
+(MQTT select loop, background sleepers, HTTP accept) are not sampled; time a
+handler spends waiting on MySQL is, since it is part of the scan latency.
+
+- <label>-<time>.txt         Top functions + breakdown under each focus function
+- <label>-<time>.collapsed   Folded stacks (flamegraph.pl / speedscope input)
+- <label>-<time>.tracemalloc Raw snapshot (load with tracemalloc.Snapshot.load)
+
+Nothing runs until a window is started (SIGUSR1 or the dashboard's local
+/admin/profile endpoint), so overhead is zero while profiling is off.
+
+================================================================================
+"""
+
+import collections
+import datetime
+import os
+import signal
+import sys
+import threading
+import time
+import tracemalloc
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+PROFILE_DIR = 'profiles'
+PROFILE_WINDOW = 30          # Seconds per profiling window
+MIN_PROFILE_WINDOW = 1
+MAX_PROFILE_WINDOW = 300
+SAMPLE_INTERVAL = 0.005      # Seconds between stack samples
+TRACEMALLOC_FRAMES = 25      # Traceback depth stored per allocation
+REPORT_TOP = 30              # Rows per report section
+
+# Leaf frames of threads parked in a blocking wait (used when no focus is given)
+IDLE_LEAVES = {
+    ("select", "selectors.py"),
+    ("wait", "threading.py"),
+    ("accept", "socket.py"),
+    ("_loop", "client.py"),
+}
+
+# Only one window may run per process
+_active_lock = threading.Lock()
+_active = None
+
+# ============================================================================
+# SAMPLING PROFILER
+# ============================================================================
+
+def _frame_key(frame):
+    """Identify a function by file, name and first line."""
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+class SamplingProfiler(threading.Thread):
+    """Background thread that samples other threads' busy stacks."""
+
+    def __init__(self, label, seconds, focus):
+        super().__init__(name=f"profiler-{label}", daemon=True)
+        self.label = label
+        self.seconds = seconds
+        self.focus = tuple(focus)
+        self.samples = 0
+        self.self_counts = collections.Counter()
+        self.total_counts = collections.Counter()
+        self.stacks = collections.Counter()
+        self.focus_counts = {name: collections.Counter() for name in self.focus}
+        self.focus_samples = collections.Counter()
+
+    def _sample(self):
+        """Record one stack sample per thread."""
+        own_id = threading.get_ident()
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_id:
+                continue
+
+            stack = []
+            while frame is not None:
+                stack.append(frame)
+                frame = frame.f_back
+            stack.reverse()  # Outermost first
+
+            # Only threads doing work we care about count as samples
+            if self.focus:
+                if not any(f.f_code.co_name in self.focus for f in stack):
+                    continue
+            else:
+                leaf = stack[-1].f_code
+                if (leaf.co_name, os.path.basename(leaf.co_filename)) in IDLE_LEAVES:
+                    continue
+            keys = [_frame_key(f) for f in stack]
+
+            self.samples += 1
+            self.self_counts[keys[-1]] += 1
+            self.total_counts.update(set(keys))
+            self.stacks[';'.join(keys)] += 1
+
+            # Per-function breakdown of everything running under a focus function
+            for name in self.focus:
+                for index, f in enumerate(stack):
+                    if f.f_code.co_name == name:
+                        self.focus_samples[name] += 1
+                        self.focus_counts[name].update(set(keys[index:]))
+                        break
+
+    def run(self):
+        """Sample until the window expires, then write the dumps."""
+        # Always release the slot, or every later window reports "already running"
+        try:
+            started_tracing = not tracemalloc.is_tracing()
+            if started_tracing:
+                tracemalloc.start(TRACEMALLOC_FRAMES)
+
+            deadline = time.monotonic() + self.seconds
+            try:
+                while time.monotonic() < deadline:
+                    self._sample()
+                    time.sleep(SAMPLE_INTERVAL)
+                snapshot = tracemalloc.take_snapshot()
+            finally:
+                if started_tracing:
+                    tracemalloc.stop()
+
+            self._write(snapshot)
+        finally:
+            _finish(self)
+
+    def _write(self, snapshot):
+        """Write text report, folded stacks and tracemalloc snapshot."""
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        stamp = datetime.datetime.now().strftime('%Y%m%d-%H%M%S')
+        base = os.path.join(PROFILE_DIR, f"{self.label}-{stamp}")
+
+        with open(base + '.collapsed', 'w') as out:
+            for stack, count in self.stacks.most_common():
+                out.write(f"{stack} {count}\n")
+
+        snapshot.dump(base + '.tracemalloc')
+
+        with open(base + '.txt', 'w') as out:
+            out.write(f"Profile '{self.label}' - {self.seconds}s window, "
+                      f"{self.samples} busy samples @ {SAMPLE_INTERVAL * 1000:.1f}ms\n")
+            if self.focus:
+                out.write(f"Sampled threads: inside {', '.join(self.focus)}\n")
+            out.write("\n")
+
+            out.write("== Top functions (self samples) ==\n")
+            for key, count in self.self_counts.most_common(REPORT_TOP):
+                out.write(f"{count:8d}  {count / max(self.samples, 1):6.1%}  {key}\n")
+
+            out.write("\n== Top functions (cumulative samples) ==\n")
+            for key, count in self.total_counts.most_common(REPORT_TOP):
+                out.write(f"{count:8d}  {count / max(self.samples, 1):6.1%}  {key}\n")
+
+            for name in self.focus:
+                inside = self.focus_samples[name]
+                out.write(f"\n== Breakdown under {name}() - {inside} samples ==\n")
+                for key, count in self.focus_counts[name].most_common(REPORT_TOP):
+                    out.write(f"{count:8d}  {count / max(inside, 1):6.1%}  {key}\n")
+
+            out.write("\n== Top allocations (tracemalloc, by line) ==\n")
+            for stat in snapshot.statistics('lineno')[:REPORT_TOP]:
+                out.write(f"{stat}\n")
+
+        print(f"📊 PROFILE WRITTEN: {base}.txt")
+
+# ============================================================================
+# CONTROL FUNCTIONS
+# ============================================================================
+
+def _finish(profiler):
+    """Release the active slot once a window has been written."""
+    global _active
+    with _active_lock:
+        if _active is profiler:
+            _active = None
+
+def start_profile(label, seconds=PROFILE_WINDOW, focus=()):
+    """Start a profiling window; returns False if one is already running."""
+    global _active
+    if not MIN_PROFILE_WINDOW <= seconds <= MAX_PROFILE_WINDOW:
+        raise ValueError(f"seconds must be between {MIN_PROFILE_WINDOW} and {MAX_PROFILE_WINDOW}")
+    with _active_lock:
+        if _active is not None:
+            print("⚠️  Profiling window already running")
+            return False
+        _active = SamplingProfiler(label, seconds, focus)
+        _active.start()
+    print(f"⏱️  PROFILING STARTED: {label} for {seconds}s")
+    return True
+
+def is_profiling():
+    """Whether a profiling window is currently running."""
+    return _active is not None
+
+def install_signal_handler(label, focus=(), signum=None):
+    """Start a profiling window whenever the process receives SIGUSR1."""
+    signum = signum or getattr(signal, 'SIGUSR1', None)
+    if signum is None:
+        return  # Not available on Windows
+
+    def handler(received, frame):
+        # Hand off to a thread so the handler never prints mid-write on stdout
+        threading.Thread(target=start_profile, args=(label,),
+                         kwargs={'focus': focus}, daemon=True).start()
+
+    signal.signal(signum, handler)
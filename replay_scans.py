@@ -0,0 +1,284 @@
+"""
+================================================================================
+            CLOUD RFID ATTENDANCE SYSTEM - TRACE REPLAY LOAD TEST
+================================================================================
+
+Replays historical scans from the `logs` table (or a gzipped CSV archive
+written by log_partitions.py) as "attendance/scan" messages against a TEST
+broker, preserving the original inter-arrival times at a chosen speed-up.
+
+Each scan is tagged with a simulated device id and a request id ("req") and
+timed until the "attendance/feedback" reply echoing that id arrives. Replies
+from servers that do not echo "req" fall back to matching the oldest pending
+scan with the same uid, so one dropped QoS 0 message cannot shift every later
+pairing.
+
+Usage:
+- python3 replay_scans.py --since "2026-03-02 07:30" --until "2026-03-02 09:00" --speed 10
+- python3 replay_scans.py --csv archive/logs_p202603.csv.gz --speed 0   (as fast as possible)
+
+================================================================================
+"""
+
+import argparse
+import collections
+import csv
+import datetime
+import gzip
+import json
+import threading
+import time
+import zlib
+
+import paho.mqtt.client as mqtt
+import pymysql
+import pymysql.cursors
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+# Source of historical scans (read only)
+DB_HOST = '34.29.88.122'
+DB_USER = 'liyana'
+DB_PASS = '123456'
+DB_NAME = 'attendance_db'
+
+# Target test instance - never point this at production
+MQTT_BROKER = "localhost"
+MQTT_PORT = 1883
+MQTT_TOPIC_SCAN = "attendance/scan"
+MQTT_TOPIC_FEEDBACK = "attendance/feedback"
+
+DEFAULT_DEVICES = 4
+FEEDBACK_TIMEOUT = 10     # Seconds to wait for outstanding replies at the end
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Feedback expected for each recorded log status
+EXPECTED_FEEDBACK = {
+    'Present': 'valid',
+    'Suspended': 'suspended',
+    'Denied': 'invalid',
+}
+
+# ============================================================================
+# TRACE LOADING
+# ============================================================================
+
+def load_from_db(since, until, limit):
+    """Fetch (timestamp, uid, status) rows in chronological order."""
+    conn = pymysql.connect(
+        host=DB_HOST,
+        user=DB_USER,
+        password=DB_PASS,
+        database=DB_NAME,
+        cursorclass=pymysql.cursors.DictCursor,
+        connect_timeout=10
+    )
+    try:
+        with conn.cursor() as cursor:
+            query = "SELECT uid, status, timestamp FROM logs WHERE timestamp >= %s AND timestamp < %s ORDER BY timestamp, id"
+            params = [since, until]
+            if limit:
+                query += " LIMIT %s"
+                params.append(limit)
+            cursor.execute(query, params)
+            return [(row['timestamp'], row['uid'], row['status']) for row in cursor.fetchall()]
+    finally:
+        conn.close()
+
+def load_from_csv(path, limit):
+    """Read rows from a (optionally gzipped) CSV export with uid,status,timestamp columns."""
+    opener = gzip.open if path.endswith('.gz') else open
+    rows = []
+    with opener(path, 'rt', newline='') as source:
+        for record in csv.DictReader(source):
+            timestamp = datetime.datetime.strptime(record['timestamp'], TIMESTAMP_FORMAT)
+            rows.append((timestamp, record['uid'], record['status']))
+    rows.sort(key=lambda row: row[0])
+    return rows[:limit] if limit else rows
+
+def device_for(uid, devices):
+    """Stable device assignment so a card always taps at the same reader."""
+    return f"replay-{zlib.crc32(uid.encode()) % devices}"
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list (shared with bench_dashboard.py)."""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+def positive_int(value):
+    """argparse type for counts that must be at least 1."""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {number}")
+    return number
+
+# ============================================================================
+# REPLAY ENGINE
+# ============================================================================
+
+class Replayer:
+    """Publishes a trace and correlates feedback replies to their scans."""
+
+    def __init__(self, broker, port):
+        self.pending = collections.OrderedDict()   # req -> (sent_at, uid, recorded_status, device)
+        self.next_req = 1
+        self.lock = threading.Lock()
+        self.latencies = []
+        self.mismatches = []
+        self.unexpected = 0
+        self.by_uid = 0                            # Replies matched by uid fallback
+
+        self.subscribed = threading.Event()
+
+        self.client = mqtt.Client(client_id="ReplayHarness", clean_session=True)
+        self.client.on_connect = self.on_connect
+        self.client.on_subscribe = lambda client, userdata, mid, granted_qos: self.subscribed.set()
+        self.client.on_message = self.on_feedback
+        self.client.connect(broker, port, keepalive=60)
+        self.client.loop_start()
+
+        # Replies published before SUBACK would be lost
+        if not self.subscribed.wait(10):
+            raise RuntimeError(f"Could not subscribe to {MQTT_TOPIC_FEEDBACK} on {broker}:{port}")
+
+    def on_connect(self, client, userdata, flags, rc):
+        """Subscribe to feedback once the broker accepts the connection."""
+        if rc == 0:
+            client.subscribe(MQTT_TOPIC_FEEDBACK, qos=1)
+        else:
+            print(f"❌ Connection failed with code {rc}")
+
+    def _match(self, reply):
+        """Pop the pending scan a reply belongs to (caller holds the lock)."""
+        req = reply.get('req')
+        if req in self.pending:
+            return self.pending.pop(req)
+        uid = reply.get('uid')
+        if req is None and uid is not None:
+            for key, entry in self.pending.items():
+                if entry[1] == uid:
+                    self.by_uid += 1
+                    return self.pending.pop(key)
+        return None
+
+    def on_feedback(self, client, userdata, msg):
+        """Pair a feedback reply with the scan it answers."""
+        received_at = time.perf_counter()
+        try:
+            reply = json.loads(msg.payload.decode('utf-8'))
+        except ValueError:
+            reply = None
+        if not isinstance(reply, dict):
+            reply = {}
+
+        with self.lock:
+            entry = self._match(reply)
+            if entry is None:
+                self.unexpected += 1
+                return
+        sent_at, uid, recorded, device = entry
+
+        self.latencies.append(received_at - sent_at)
+        actual = reply.get('status')
+        expected = EXPECTED_FEEDBACK.get(recorded)
+        if expected is not None and actual != expected:
+            self.mismatches.append((uid, device, recorded, expected, actual))
+
+    def replay(self, rows, speed, devices):
+        """Publish rows with original spacing divided by `speed` (0 = no waiting)."""
+        if not rows:
+            return
+        origin = rows[0][0]
+        start = time.perf_counter()
+
+        for timestamp, uid, recorded in rows:
+            if speed > 0:
+                due = start + (timestamp - origin).total_seconds() / speed
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+
+            device = device_for(uid, devices)
+            with self.lock:
+                req = self.next_req
+                self.next_req += 1
+                self.pending[req] = (time.perf_counter(), uid, recorded, device)
+            payload = json.dumps({"uid": uid, "device": device, "req": req})
+            self.client.publish(MQTT_TOPIC_SCAN, payload, qos=1)
+
+    def drain(self, timeout):
+        """Wait for outstanding replies; return how many never arrived."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self.lock:
+                if not self.pending:
+                    break
+            time.sleep(0.05)
+        self.client.loop_stop()
+        self.client.disconnect()
+        return len(self.pending)
+
+def print_report(total, elapsed, replayer, lost):
+    """Summarise throughput, latency percentiles and outcome mismatches."""
+    latencies = sorted(replayer.latencies)
+    print("="*70)
+    print(f"  REPLAY REPORT - {total} scans in {elapsed:.1f}s ({total / max(elapsed, 1e-9):.1f} scans/s)")
+    print("="*70)
+    print(f"Answered:   {len(latencies)}")
+    print(f"Lost:       {lost}")
+    print(f"Unexpected: {replayer.unexpected} replies matching no pending scan")
+    if replayer.by_uid:
+        print(f"By uid:     {replayer.by_uid} replies without 'req' matched on uid (server does not echo req)")
+    if latencies:
+        print(f"Latency p50: {percentile(latencies, 0.50) * 1000:.1f} ms")
+        print(f"Latency p95: {percentile(latencies, 0.95) * 1000:.1f} ms")
+        print(f"Latency p99: {percentile(latencies, 0.99) * 1000:.1f} ms")
+        print(f"Latency max: {latencies[-1] * 1000:.1f} ms")
+    print(f"Mismatches: {len(replayer.mismatches)}")
+    for uid, device, recorded, expected, actual in replayer.mismatches[:20]:
+        print(f"  ⚠️  {uid} @ {device}: recorded {recorded} → expected '{expected}', got '{actual}'")
+    print("="*70)
+
+# ============================================================================
+# MAIN PROGRAM
+# ============================================================================
+
+def main():
+    """Load a trace, replay it against the test broker and report."""
+    parser = argparse.ArgumentParser(description="Replay historical scans against a test instance.")
+    parser.add_argument('--csv', help="Replay from a CSV(.gz) export instead of the database")
+    parser.add_argument('--since', help="Start of window, e.g. '2026-03-02 07:30'")
+    parser.add_argument('--until', help="End of window (exclusive)")
+    parser.add_argument('--limit', type=int, default=0, help="Maximum scans to replay")
+    parser.add_argument('--speed', type=float, default=1.0, help="Speed-up factor; 0 = as fast as possible")
+    parser.add_argument('--devices', type=positive_int, default=DEFAULT_DEVICES, help="Simulated readers")
+    parser.add_argument('--broker', default=MQTT_BROKER)
+    parser.add_argument('--port', type=int, default=MQTT_PORT)
+    parser.add_argument('--timeout', type=float, default=FEEDBACK_TIMEOUT)
+    args = parser.parse_args()
+
+    if args.csv:
+        rows = load_from_csv(args.csv, args.limit)
+    else:
+        if not (args.since and args.until):
+            parser.error("--since and --until are required when replaying from the database")
+        rows = load_from_db(args.since, args.until, args.limit)
+
+    speed_label = "max" if args.speed <= 0 else f"{args.speed:g}x"
+    print(f"📼 Loaded {len(rows)} scans - replaying at {speed_label} over {args.devices} devices")
+    print(f"📡 Target broker: {args.broker}:{args.port}")
+
+    replayer = Replayer(args.broker, args.port)
+    start = time.perf_counter()
+    replayer.replay(rows, args.speed, args.devices)
+    # Throughput covers publishing only; waiting for stragglers is not load
+    elapsed = time.perf_counter() - start
+    lost = replayer.drain(args.timeout)
+
+    print_report(len(rows), elapsed, replayer, lost)
+
+if __name__ == "__main__":
+    main()
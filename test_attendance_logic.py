@@ -0,0 +1,146 @@
+"""
+================================================================================
+            CLOUD RFID ATTENDANCE SYSTEM - OFFLINE BATCH TESTS
+================================================================================
+
+Tests for process_batch() against an in-memory stand-in for the logs and
+batch_seen tables. No database or MQTT broker is needed.
+
+Usage:
+- python3 -m pytest -q test_attendance_logic.py
+
+================================================================================
+"""
+
+import datetime
+
+import pytest
+
+import attendance_logic
+import malaysia_time
+
+NOW_MS = malaysia_time.local_to_ms(datetime.datetime(2026, 3, 10, 8, 0))
+NOW = NOW_MS / 1000
+
+class FakeCursor:
+    """Just enough of a DictCursor for the batch path."""
+
+    def __init__(self):
+        self.seen = set()      # (device, boot, seq) rows in batch_seen
+        self.logs = []         # (uid, status, timestamp, ts_ms) rows in logs
+        self.rows = []
+
+    def execute(self, query, params):
+        assert query.startswith("SELECT seq FROM batch_seen")
+        device, boot, *seqs = params
+        self.rows = [{'seq': seq} for seq in seqs if (device, boot, seq) in self.seen]
+
+    def fetchall(self):
+        return self.rows
+
+    def executemany(self, query, rows):
+        if query.startswith("INSERT INTO logs"):
+            self.logs.extend(rows)
+        elif query.startswith("INSERT INTO batch_seen"):
+            for device, boot, seq, _ in rows:
+                assert (device, boot, seq) not in self.seen
+                self.seen.add((device, boot, seq))
+        else:
+            raise AssertionError(query)
+
+@pytest.fixture(autouse=True)
+def fixed_clock(monkeypatch):
+    """Freeze server time and load a one-student roster."""
+    monkeypatch.setattr(malaysia_time, 'now_ms', lambda: NOW_MS)
+    monkeypatch.setattr(malaysia_time, 'today_local', lambda: malaysia_time.local_datetime(NOW_MS).date())
+    monkeypatch.setattr(attendance_logic, 'roster', {'A1': {'uid': 'A1', 'name': 'Ali', 'status': 'Active'}})
+    monkeypatch.setattr(attendance_logic, 'roster_version', 1)
+
+def scan(seq, uid='A1', ts=NOW - 60):
+    return {'uid': uid, 'ts': ts, 'seq': seq}
+
+def ack(cursor, device, boot, scans):
+    """The ack half of process_batch()."""
+    return attendance_logic.process_batch(cursor, device, boot, scans)[0]
+
+def test_new_scans_are_inserted_with_status():
+    cursor = FakeCursor()
+    result = ack(cursor, 'gate-1', 'b1', [scan(1), scan(2, uid='ZZ')])
+
+    assert result == ([1, 2], [], 2, 0, [])
+    assert [(uid, status) for uid, status, _, _ in cursor.logs] == [('A1', 'Present'), ('ZZ', 'Denied')]
+    assert cursor.logs[0][3] == NOW_MS - 60000
+
+def test_only_inserted_rows_become_feed_events():
+    cursor = FakeCursor()
+    ack(cursor, 'gate-1', 'b1', [scan(1)])
+    _, events = attendance_logic.process_batch(cursor, 'gate-1', 'b1', [scan(1), scan(2, uid='ZZ'), {'seq': 3}])
+
+    assert events == [('ZZ', None, 'Denied', NOW_MS - 60000)]
+
+def test_resent_and_repeated_seqs_are_deduped():
+    cursor = FakeCursor()
+    ack(cursor, 'gate-1', 'b1', [scan(1), scan(3)])
+    result = ack(cursor, 'gate-1', 'b1', [scan(3), scan(2), scan(2), scan(1)])
+
+    assert result == ([1, 2, 3], [], 1, 2, [])
+    assert len(cursor.logs) == 3
+
+def test_reboot_and_other_devices_are_not_duplicates():
+    cursor = FakeCursor()
+    ack(cursor, 'gate-1', 'b1', [scan(1)])
+
+    assert ack(cursor, 'gate-1', 'b2', [scan(1)])[2] == 1
+    assert ack(cursor, 'gate-2', 'b1', [scan(1)])[2] == 1
+    assert len(cursor.logs) == 3
+
+def test_malformed_scans_are_rejected():
+    cursor = FakeCursor()
+    scans = [
+        {'uid': 'A1', 'ts': NOW},            # No seq: cannot be acked at all
+        {'seq': 1, 'ts': NOW},               # No uid
+        {'seq': 2, 'uid': '', 'ts': NOW},    # Empty uid
+        {'seq': 3, 'uid': 'A1', 'ts': 'x'},  # Unparseable ts
+        {'seq': 4, 'uid': 'A1'},             # No ts
+        scan(5),
+    ]
+    result = ack(cursor, 'gate-1', 'b1', scans)
+
+    assert result == ([5], [1, 2, 3, 4], 1, 0, [])
+    assert cursor.seen == {('gate-1', 'b1', 5)}
+
+def test_batch_of_only_rejects_touches_nothing():
+    cursor = FakeCursor()
+    assert ack(cursor, 'gate-1', 'b1', [{'seq': 1}]) == ([], [1], 0, 0, [])
+    assert cursor.logs == [] and cursor.seen == set()
+
+@pytest.mark.parametrize('ts', [
+    0,                                                              # Unsynced clock (1970)
+    malaysia_time.local_to_ms(datetime.datetime(2025, 2, 28, 23, 59)) / 1000,  # Before retention
+    NOW + attendance_logic.MAX_DEVICE_CLOCK_SKEW + 1,               # Too far ahead
+    NOW + 10 * 365 * 86400,                                         # Would land in pmax
+])
+def test_out_of_range_ts_falls_back_to_receive_time(ts):
+    cursor = FakeCursor()
+    result = ack(cursor, 'gate-1', 'b1', [scan(1, ts=ts)])
+
+    assert result == ([1], [], 1, 0, [1])
+    _, _, timestamp, ts_ms = cursor.logs[0]
+    assert ts_ms == NOW_MS
+    assert timestamp == datetime.datetime(2026, 3, 10, 8, 0)
+
+@pytest.mark.parametrize('ts', [
+    malaysia_time.local_to_ms(datetime.datetime(2025, 3, 1)) / 1000,  # First instant kept online
+    NOW + attendance_logic.MAX_DEVICE_CLOCK_SKEW,
+])
+def test_ts_at_the_bounds_is_kept(ts):
+    cursor = FakeCursor()
+    result = ack(cursor, 'gate-1', 'b1', [scan(1, ts=ts)])
+
+    assert result[4] == []
+    assert cursor.logs[0][3] == int(ts * 1000)
+
+def test_reclocked_duplicates_are_not_reported_again():
+    cursor = FakeCursor()
+    ack(cursor, 'gate-1', 'b1', [scan(1, ts=0)])
+    assert ack(cursor, 'gate-1', 'b1', [scan(1, ts=0)]) == ([1], [], 0, 1, [])